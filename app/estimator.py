@@ -1,14 +1,16 @@
 # app/estimator.py
 from __future__ import annotations
 
+import weakref
 from dataclasses import dataclass
-from typing import List
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple
 
-from app.pricebook_loader import Pricebook, PricebookItem, get_item
+from app.pricebook_loader import PricebookItem, PricebookLike
 from math import ceil 
 
 
-@dataclass
+@dataclass(slots=True)
 class FenceEstimateInput:
     """
     High-level inputs for a fence job.
@@ -21,30 +23,74 @@ class FenceEstimateInput:
     gates: int = 0
 
 
-def build_fence_bom(pricebook: Pricebook, fence: FenceEstimateInput) -> List[LineItemInput]:
+# Pricebooks seen by build_fence_bom, keyed by id() so the BOM cache below can
+# take a hashable key. Held weakly so discarded pricebooks aren't kept alive;
+# when one is collected the BOM cache is cleared, since its id may be reused.
+_PRICEBOOKS: "weakref.WeakValueDictionary[int, PricebookLike]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def build_fence_bom(pricebook: PricebookLike, fence: FenceEstimateInput) -> List[LineItemInput]:
     """
     Build a Bill of Materials (BOM) for a fence based on length, style, etc.
 
     For now, this:
       - finds one item in each category (post, rail, picket, concrete, fastener, gate)
       - calculates quantities using simple demo formulas
+
+    Results are memoised per pricebook and input; call clear_fence_bom_cache()
+    after changing a pricebook in place.
+    """
+    pricebook_id = id(pricebook)
+    if pricebook_id not in _PRICEBOOKS:
+        _PRICEBOOKS[pricebook_id] = pricebook
+        weakref.finalize(pricebook, _build_fence_bom_cached.cache_clear)
+    return [
+        LineItemInput(sku=sku, quantity=quantity)
+        for sku, quantity in _build_fence_bom_cached(
+            pricebook_id,
+            fence.fence_length_ft,
+            fence.style,
+            fence.posts_per_ft,
+            fence.gates,
+        )
+    ]
+
+
+def clear_fence_bom_cache() -> None:
+    """
+    Drop all memoised BOMs.
     """
+    _build_fence_bom_cached.cache_clear()
+
+
+@lru_cache(maxsize=1024)
+def _build_fence_bom_cached(
+    pricebook_id: int,
+    fence_length_ft: float,
+    style: str,
+    posts_per_ft: float,
+    gates: int,
+) -> Tuple[Tuple[str, float], ...]:
+    # Cached as immutable (sku, quantity) pairs; build_fence_bom wraps each
+    # call's result in new LineItemInput objects.
+    pricebook = _PRICEBOOKS[pricebook_id]
 
     # --- helper: pick first item by category ---
     def pick_by_category(category: str) -> PricebookItem:
-        for item in pricebook.values():
-            if item.category == category:
-                return item
-        raise KeyError(f"No pricebook item with category='{category}'")
+        if category in pricebook.missing_categories:
+            raise KeyError(f"No pricebook item with category='{category}'")
+        return pricebook.by_category[category]
 
     # simple formulas – good enough for a demo, can refine later
-    posts_qty = max(2, ceil(fence.fence_length_ft * fence.posts_per_ft))
+    posts_qty = max(2, ceil(fence_length_ft * posts_per_ft))
     rails_per_section = 2
     rails_qty = max(0, (posts_qty - 1) * rails_per_section)
 
     # Demo assumption: 2 pickets per foot for wood
-    pickets_per_ft = 2.0 if fence.style == "wood" else 2.0
-    pickets_qty = ceil(fence.fence_length_ft * pickets_per_ft)
+    pickets_per_ft = 2.0 if style == "wood" else 2.0
+    pickets_qty = ceil(fence_length_ft * pickets_per_ft)
 
     # Concrete: 0.75 bag per post
     bags_per_post = 0.75
@@ -53,7 +99,7 @@ def build_fence_bom(pricebook: Pricebook, fence: FenceEstimateInput) -> List[Lin
     # Fasteners: 1 box per 200 pickets
     fasteners_boxes = max(1, ceil(pickets_qty / 200))
 
-    gate_qty = max(0, fence.gates)
+    gate_qty = max(0, gates)
 
     # Look up one SKU per category
     post_item = pick_by_category("post")
@@ -64,32 +110,29 @@ def build_fence_bom(pricebook: Pricebook, fence: FenceEstimateInput) -> List[Lin
 
     gate_item = None
     if gate_qty > 0:
-        try:
-            gate_item = pick_by_category("gate")
-        except KeyError:
-            gate_item = None  # optional
-
-    bom: List[LineItemInput] = [
-        LineItemInput(sku=post_item.sku, quantity=posts_qty),
-        LineItemInput(sku=rail_item.sku, quantity=rails_qty),
-        LineItemInput(sku=picket_item.sku, quantity=pickets_qty),
-        LineItemInput(sku=concrete_item.sku, quantity=concrete_qty),
-        LineItemInput(sku=fastener_item.sku, quantity=fasteners_boxes),
+        gate_item = pricebook.by_category.get("gate")  # optional
+
+    bom: List[Tuple[str, float]] = [
+        (post_item.sku, posts_qty),
+        (rail_item.sku, rails_qty),
+        (picket_item.sku, pickets_qty),
+        (concrete_item.sku, concrete_qty),
+        (fastener_item.sku, fasteners_boxes),
     ]
 
     if gate_item and gate_qty > 0:
-        bom.append(LineItemInput(sku=gate_item.sku, quantity=gate_qty))
+        bom.append((gate_item.sku, gate_qty))
 
-    return bom
+    return tuple(bom)
 
 
-@dataclass
+@dataclass(slots=True)
 class LineItemInput:
     sku: str
     quantity: float
 
 
-@dataclass
+@dataclass(slots=True)
 class LineItemEstimate:
     sku: str
     description: str
@@ -98,8 +141,18 @@ class LineItemEstimate:
     unit_price: float
     extended_price: float
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sku": self.sku,
+            "description": self.description,
+            "quantity": self.quantity,
+            "unit": self.unit,
+            "unit_price": self.unit_price,
+            "extended_price": self.extended_price,
+        }
+
 
-@dataclass
+@dataclass(slots=True)
 class EstimateBreakdown:
     materials_subtotal: float
     labor_hours: float
@@ -111,17 +164,50 @@ class EstimateBreakdown:
     total: float
     line_items: List[LineItemEstimate]
 
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Plain-dict form for JSON responses; a cheaper dataclasses.asdict().
+        """
+        return {
+            "materials_subtotal": self.materials_subtotal,
+            "labor_hours": self.labor_hours,
+            "labor_rate": self.labor_rate,
+            "labor_total": self.labor_total,
+            "subtotal": self.subtotal,
+            "margin_pct": self.margin_pct,
+            "margin_amount": self.margin_amount,
+            "total": self.total,
+            "line_items": [line.to_dict() for line in self.line_items],
+        }
+
 
 def _round_money(value: float) -> float:
     return round(value, 2)
 
 
+def _price_lines(
+    quantities: Sequence[float], unit_prices: Sequence[float]
+) -> Tuple[List[float], float]:
+    """
+    Return (extended prices, materials subtotal) for parallel qty/price lists.
+    """
+    extended: List[float] = []
+    subtotal = 0.0
+    for quantity, unit_price in zip(quantities, unit_prices):
+        extended_price = quantity * unit_price
+        extended.append(extended_price)
+        subtotal += extended_price
+    return extended, subtotal
+
+
 def calculate_estimate(
-    pricebook: Pricebook,
+    pricebook: PricebookLike,
     line_items: List[LineItemInput],
     labor_hours: float = 0.0,
     labor_rate: float = 0.0,
     margin_pct: float = 0.0,
+    *,
+    materials_only: bool = False,
 ) -> EstimateBreakdown:
     """
     Core math for a fence estimate.
@@ -130,30 +216,55 @@ def calculate_estimate(
     - Multiplies quantity * unit_price for material totals.
     - Adds labor (labor_hours * labor_rate).
     - Applies margin_pct as a markup on subtotal (materials + labor).
+
+    With materials_only=True (purchase orders) labor and margin are skipped
+    and reported as zero, so subtotal and total equal the materials subtotal.
     """
     if labor_hours < 0 or labor_rate < 0 or margin_pct < 0:
         raise ValueError("labor_hours, labor_rate, and margin_pct must be non-negative")
 
-    estimated_lines: List[LineItemEstimate] = []
-    materials_subtotal = 0.0
-
-    for item in line_items:
-        if item.quantity <= 0:
-            raise ValueError(f"Quantity must be positive for SKU {item.sku}")
-
-        pb_item: PricebookItem = get_item(pricebook, item.sku)
-        extended_price = item.quantity * pb_item.unit_price
-        materials_subtotal += extended_price
-
-        estimated_lines.append(
-            LineItemEstimate(
-                sku=pb_item.sku,
-                description=pb_item.description,
-                quantity=item.quantity,
-                unit=pb_item.unit,
-                unit_price=pb_item.unit_price,
-                extended_price=_round_money(extended_price),
-            )
+    n = len(line_items)
+    pb_items: List[PricebookItem] = [None] * n  # type: ignore[list-item]
+    quantities: List[float] = [0.0] * n
+    pricebook_get = pricebook.__getitem__
+    try:
+        for i, item in enumerate(line_items):
+            if item.quantity <= 0:
+                raise ValueError(f"Quantity must be positive for SKU {item.sku}")
+
+            pb_items[i] = pricebook_get(item.sku)
+            quantities[i] = item.quantity
+    except KeyError as exc:
+        raise KeyError(f"SKU not found in pricebook: {exc.args[0]}") from exc
+
+    extended_prices, materials_subtotal = _price_lines(
+        quantities, [pb_item.unit_price for pb_item in pb_items]
+    )
+
+    estimated_lines: List[LineItemEstimate] = [
+        LineItemEstimate(
+            sku=pb_item.sku,
+            description=pb_item.description,
+            quantity=item.quantity,
+            unit=pb_item.unit,
+            unit_price=pb_item.unit_price,
+            extended_price=_round_money(extended_price),
+        )
+        for item, pb_item, extended_price in zip(line_items, pb_items, extended_prices)
+    ]
+
+    if materials_only:
+        materials_subtotal = _round_money(materials_subtotal)
+        return EstimateBreakdown(
+            materials_subtotal=materials_subtotal,
+            labor_hours=0.0,
+            labor_rate=0.0,
+            labor_total=0.0,
+            subtotal=materials_subtotal,
+            margin_pct=0.0,
+            margin_amount=0.0,
+            total=materials_subtotal,
+            line_items=estimated_lines,
         )
 
     labor_total = labor_hours * labor_rate
@@ -1,10 +1,11 @@
 #app/main.py
 from __future__ import annotations
 
+import asyncio
 import base64
 import io
+import logging
 import os
-from dataclasses import asdict
 from typing import List, Optional
 
 from fastapi import FastAPI, HTTPException
@@ -18,11 +19,14 @@ from app.estimator import (
     calculate_estimate,
     FenceEstimateInput,      # add this
     build_fence_bom, 
+    clear_fence_bom_cache,
 )
 from app.pdf_quote import render_quote_pdf
-from app.pricebook_loader import Pricebook, load_pricebook
+from app.pricebook_loader import PricebookLike, load_pricebook, load_pricebook_cached
 
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Fencing Estimator")
 
 
@@ -58,13 +62,42 @@ class PORequest(BaseModel):
     project_name: Optional[str] = None
 
 
-def _load_pricebook_for_app() -> Pricebook:
+class EstimatedLineItem(BaseModel):
+    sku: str
+    description: str
+    quantity: float
+    unit: str
+    unit_price: float
+    extended_price: float
+
+
+class EstimateResponse(BaseModel):
+    materials_subtotal: float
+    labor_hours: float
+    labor_rate: float
+    labor_total: float
+    subtotal: float
+    margin_pct: float
+    margin_amount: float
+    total: float
+    line_items: List[EstimatedLineItem]
+    pdf_base64: Optional[str] = None
+
+
+def _load_pricebook_for_app() -> PricebookLike:
     """
     Locate and load the pricebook for the API.
 
     - Use PRICEBOOK_PATH if set.
     - Otherwise try ./pricebook.csv then ./samples/pricebook.csv
+    - With PRICEBOOK_CACHE=1, load through the on-disk pickle cache.
+    - With PRICEBOOK_SHARED=1, share one copy across worker processes via
+      shared memory (requires numpy). The worker that publishes it parses
+      the CSV directly, so PRICEBOOK_CACHE does not apply.
     """
+    use_cache = os.getenv("PRICEBOOK_CACHE") == "1"
+    use_shared = os.getenv("PRICEBOOK_SHARED") == "1"
+
     candidates = []
     env_path = os.getenv("PRICEBOOK_PATH")
     if env_path:
@@ -73,6 +106,12 @@ def _load_pricebook_for_app() -> Pricebook:
 
     for candidate in candidates:
         if candidate and os.path.exists(candidate):
+            if use_shared:
+                from app.pricebook_shared import load_shared_pricebook
+
+                return load_shared_pricebook(candidate)
+            if use_cache:
+                return load_pricebook_cached(candidate)
             return load_pricebook(candidate)
 
     raise RuntimeError(
@@ -83,17 +122,64 @@ def _load_pricebook_for_app() -> Pricebook:
 @app.on_event("startup")
 def startup_event() -> None:
     app.state.pricebook = _load_pricebook_for_app()
+    if app.state.pricebook.missing_categories:
+        logger.warning(
+            "Pricebook has no items for fence categories: %s; /estimate_fence will fail",
+            ", ".join(sorted(app.state.pricebook.missing_categories)),
+        )
+    clear_fence_bom_cache()
+
 
+@app.on_event("shutdown")
+def shutdown_event() -> None:
+    # Shared-memory pricebooks release (and, in the creating worker, unlink)
+    # their segment; plain Pricebook dicts have nothing to close.
+    close = getattr(getattr(app.state, "pricebook", None), "close", None)
+    if close is not None:
+        close()
 
-def _ensure_pricebook() -> Pricebook:
+
+def _ensure_pricebook() -> PricebookLike:
     pricebook = getattr(app.state, "pricebook", None)
     if not pricebook:
         raise HTTPException(status_code=500, detail="Pricebook is not loaded")
     return pricebook
 
 
-@app.post("/estimate")
-def create_estimate(request: EstimateRequest):
+def _render_pdf_base64(
+    payload: dict,
+    customer_name: Optional[str],
+    project_name: Optional[str],
+) -> str:
+    pdf_bytes = render_quote_pdf(
+        payload,
+        customer_name=customer_name,
+        project_name=project_name,
+    )
+    return base64.b64encode(pdf_bytes).decode("ascii")
+
+
+def _estimate_fence(
+    pricebook: PricebookLike,
+    fence_input: FenceEstimateInput,
+    labor_hours: float,
+    labor_rate: float,
+    margin_pct: float,
+) -> EstimateBreakdown:
+    line_inputs: List[LineItemInput] = build_fence_bom(pricebook, fence_input)
+    return calculate_estimate(
+        pricebook=pricebook,
+        line_items=line_inputs,
+        labor_hours=labor_hours,
+        labor_rate=labor_rate,
+        margin_pct=margin_pct,
+    )
+
+
+@app.post(
+    "/estimate", response_model=EstimateResponse, response_model_exclude_none=True
+)
+async def create_estimate(request: EstimateRequest):
     if not request.line_items:
         raise HTTPException(status_code=400, detail="At least one line item is required")
 
@@ -104,7 +190,8 @@ def create_estimate(request: EstimateRequest):
     ]
 
     try:
-        estimate: EstimateBreakdown = calculate_estimate(
+        estimate: EstimateBreakdown = await asyncio.to_thread(
+            calculate_estimate,
             pricebook=pricebook,
             line_items=line_inputs,
             labor_hours=request.labor_hours,
@@ -116,21 +203,21 @@ def create_estimate(request: EstimateRequest):
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    payload = asdict(estimate)
+    payload = estimate.to_dict()
 
     if request.include_pdf:
-        pdf_bytes = render_quote_pdf(
-            estimate,
-            customer_name=request.customer_name,
-            project_name=request.project_name,
+        payload["pdf_base64"] = await asyncio.to_thread(
+            _render_pdf_base64,
+            payload,
+            request.customer_name,
+            request.project_name,
         )
-        payload["pdf_base64"] = base64.b64encode(pdf_bytes).decode("ascii")
 
     return payload
 
 
 @app.post("/po")
-def create_purchase_order(request: PORequest):
+async def create_purchase_order(request: PORequest):
     if not request.line_items:
         raise HTTPException(status_code=400, detail="At least one line item is required")
 
@@ -141,19 +228,19 @@ def create_purchase_order(request: PORequest):
     ]
 
     try:
-        estimate: EstimateBreakdown = calculate_estimate(
+        estimate: EstimateBreakdown = await asyncio.to_thread(
+            calculate_estimate,
             pricebook=pricebook,
             line_items=line_inputs,
-            labor_hours=0.0,
-            labor_rate=0.0,
-            margin_pct=0.0,
+            materials_only=True,
         )
     except KeyError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    pdf_bytes = render_quote_pdf(
+    pdf_bytes = await asyncio.to_thread(
+        render_quote_pdf,
         estimate,
         customer_name=request.customer_name,
         project_name=request.project_name,
@@ -166,8 +253,10 @@ def create_purchase_order(request: PORequest):
     )
 
 
-@app.post("/estimate_fence")
-def create_fence_estimate(request: FenceEstimateRequest):
+@app.post(
+    "/estimate_fence", response_model=EstimateResponse, response_model_exclude_none=True
+)
+async def create_fence_estimate(request: FenceEstimateRequest):
     """
     High-level fence estimator.
 
@@ -187,10 +276,10 @@ def create_fence_estimate(request: FenceEstimateRequest):
     )
 
     try:
-        line_inputs: List[LineItemInput] = build_fence_bom(pricebook, fence_input)
-        estimate: EstimateBreakdown = calculate_estimate(
+        estimate: EstimateBreakdown = await asyncio.to_thread(
+            _estimate_fence,
             pricebook=pricebook,
-            line_items=line_inputs,
+            fence_input=fence_input,
             labor_hours=request.labor_hours,
             labor_rate=request.labor_rate,
             margin_pct=request.margin_pct,
@@ -200,15 +289,15 @@ def create_fence_estimate(request: FenceEstimateRequest):
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    payload = asdict(estimate)
+    payload = estimate.to_dict()
 
     if request.include_pdf:
-        pdf_bytes = render_quote_pdf(
-            estimate,
-            customer_name=request.customer_name,
-            project_name=request.project_name,
+        payload["pdf_base64"] = await asyncio.to_thread(
+            _render_pdf_base64,
+            payload,
+            request.customer_name,
+            request.project_name,
         )
-        payload["pdf_base64"] = base64.b64encode(pdf_bytes).decode("ascii")
 
     return payload
 
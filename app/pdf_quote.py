@@ -1,15 +1,21 @@
 # app/pdf_quote.py
 from __future__ import annotations
 
-from dataclasses import asdict
-from datetime import datetime
-from typing import Optional
+import time
+from operator import itemgetter
+from typing import Any, Dict, Optional
 
 from app.estimator import EstimateBreakdown
 
 
+_LI_FIELDS = itemgetter(
+    "sku", "quantity", "unit", "unit_price", "extended_price", "description"
+)
+_LI_FMT = "{:<12} {:>7.2f} {:<6} @ {:>8.2f} = {:>9.2f}\n".format
+
+
 def render_quote_pdf(
-    estimate: EstimateBreakdown,
+    estimate: EstimateBreakdown | Dict[str, Any],
     customer_name: Optional[str] = None,
     project_name: Optional[str] = None,
     output_path: Optional[str] = None,
@@ -21,48 +27,51 @@ def render_quote_pdf(
     human-readable text representation of the quote, encoded as bytes. You can
     later swap this out for a real PDF generator like ReportLab or WeasyPrint
     without changing the public interface.
+
+    ``estimate`` may be an EstimateBreakdown or its already-converted dict
+    form, so callers that have built a JSON payload don't convert it twice.
     """
-    data = asdict(estimate)
+    data = estimate if isinstance(estimate, dict) else estimate.to_dict()
 
-    lines = []
-    lines.append("FENCE QUOTE")
-    lines.append("=" * 40)
-    lines.append(f"Generated: {datetime.now().isoformat(timespec='seconds')}")
+    out = bytearray()
+
+    def write(text: str) -> None:
+        out.extend(text.encode("utf-8"))
+
+    write("FENCE QUOTE\n")
+    write("=" * 40 + "\n")
+    write(f"Generated: {time.strftime('%Y-%m-%dT%H:%M:%S')}\n")
     if customer_name:
-        lines.append(f"Customer: {customer_name}")
+        write(f"Customer: {customer_name}\n")
     if project_name:
-        lines.append(f"Project: {project_name}")
-    lines.append("")
-    lines.append("LINE ITEMS")
-    lines.append("-" * 40)
+        write(f"Project: {project_name}\n")
+    write("\n")
+    write("LINE ITEMS\n")
+    write("-" * 40 + "\n")
 
     for item in data["line_items"]:
-        lines.append(
-            f"{item['sku']:<12} "
-            f"{item['quantity']:>7.2f} {item['unit']:<6} "
-            f"@ {item['unit_price']:>8.2f} = {item['extended_price']:>9.2f}"
-        )
-        if item["description"]:
-            lines.append(f"  {item['description']}")
-
-    lines.append("")
-    lines.append("TOTALS")
-    lines.append("-" * 40)
-    lines.append(f"Materials:     {data['materials_subtotal']:>10.2f}")
-    lines.append(
+        sku, quantity, unit, unit_price, extended_price, description = _LI_FIELDS(item)
+        write(_LI_FMT(sku, quantity, unit, unit_price, extended_price))
+        if description:
+            write(f"  {description}\n")
+
+    write("\n")
+    write("TOTALS\n")
+    write("-" * 40 + "\n")
+    write(f"Materials:     {data['materials_subtotal']:>10.2f}\n")
+    write(
         f"Labor:         {data['labor_hours']:>5.2f} h x "
-        f"{data['labor_rate']:>7.2f} = {data['labor_total']:>10.2f}"
+        f"{data['labor_rate']:>7.2f} = {data['labor_total']:>10.2f}\n"
     )
-    lines.append(f"Subtotal:      {data['subtotal']:>10.2f}")
-    lines.append(
-        f"Margin ({data['margin_pct']:>4.1f}%): {data['margin_amount']:>10.2f}"
+    write(f"Subtotal:      {data['subtotal']:>10.2f}\n")
+    write(
+        f"Margin ({data['margin_pct']:>4.1f}%): {data['margin_amount']:>10.2f}\n"
     )
-    lines.append(f"TOTAL:         {data['total']:>10.2f}")
-    lines.append("")
-    lines.append("Thank you for your business.")
+    write(f"TOTAL:         {data['total']:>10.2f}\n")
+    write("\n")
+    write("Thank you for your business.\n")
 
-    content = "\n".join(lines) + "\n"
-    pdf_bytes = content.encode("utf-8")
+    pdf_bytes = bytes(out)
 
     if output_path:
         with open(output_path, "wb") as f:
@@ -2,12 +2,18 @@
 from __future__ import annotations
 
 import csv
+import logging
+import os
+import pickle
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, Mapping, Optional
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional, Protocol, Tuple
 
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
 class PricebookItem:
     sku: str
     description: str
@@ -17,7 +23,55 @@ class PricebookItem:
     category: Optional[str] = None
 
 
-Pricebook = Dict[str, PricebookItem]
+# Categories build_fence_bom cannot quote a fence without.
+REQUIRED_FENCE_CATEGORIES: FrozenSet[str] = frozenset(
+    {"post", "rail", "picket", "concrete", "fastener"}
+)
+
+
+class Pricebook(Dict[str, PricebookItem]):
+    """
+    Pricebook items keyed by SKU.
+
+    Also carries ``by_category``, mapping each category to the first item
+    seen for it, so category lookups don't have to scan every item, and
+    ``missing_categories``, the REQUIRED_FENCE_CATEGORIES it has no item for.
+    Both are built on construction; call reindex() after adding or replacing
+    items.
+    """
+
+    by_category: Dict[str, PricebookItem]
+    missing_categories: FrozenSet[str]
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.reindex()
+
+    def reindex(self) -> None:
+        """
+        Rebuild by_category and missing_categories from the current items.
+        """
+        by_category: Dict[str, PricebookItem] = {}
+        for item in self.values():
+            if item.category:
+                by_category.setdefault(item.category, item)
+        self.by_category = by_category
+        self.missing_categories = REQUIRED_FENCE_CATEGORIES.difference(by_category)
+
+
+class PricebookLike(Protocol):
+    """
+    The reads the estimator makes; met by Pricebook and SharedPricebook.
+    """
+
+    by_category: Dict[str, PricebookItem]
+    missing_categories: FrozenSet[str]
+
+    def __getitem__(self, sku: str) -> PricebookItem: ...
+
+    def __contains__(self, sku: object) -> bool: ...
+
+    def __len__(self) -> int: ...
 
 
 _FIELD_ALIASES: Mapping[str, Iterable[str]] = {
@@ -73,29 +127,43 @@ def load_pricebook(path: str | Path) -> Pricebook:
     if not path.exists():
         raise FileNotFoundError(f"Pricebook CSV not found: {path}")
 
-    items: Pricebook = {}
+    items = Pricebook()
     with path.open("r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        if reader.fieldnames is None:
+        reader = csv.reader(f)
+        headers = next(reader, None)
+        if headers is None:
             raise ValueError("Pricebook CSV has no header row")
 
-        header_map = _build_header_map(reader.fieldnames)
+        header_map = _build_header_map(headers)
+        positions = {header: i for i, header in enumerate(headers)}
+        col_idx: Dict[str, int] = {
+            field: positions[header] for field, header in header_map.items()
+        }
+        sku_col = col_idx["sku"]
+        description_col = col_idx["description"]
+        unit_col = col_idx["unit"]
+        unit_price_col = col_idx["unit_price"]
+        # Optional columns are -1 when the CSV doesn't have them.
+        unit_cost_col = col_idx.get("unit_cost", -1)
+        category_col = col_idx.get("category", -1)
+        width = len(headers)
 
         for idx, row in enumerate(reader, start=2):  # 1-based + header
-            def get(field: str, default: str = "") -> str:
-                header = header_map.get(field)
-                return (row.get(header, default) or "").strip() if header else default
+            if not row:
+                continue
+            if len(row) < width:
+                row += [""] * (width - len(row))
 
-            sku = get("sku")
+            sku = row[sku_col].strip()
             if not sku:
                 # Skip completely blank lines
-                if not any(value.strip() for value in row.values() if value):
+                if not any(value.strip() for value in row):
                     continue
                 raise ValueError(f"Row {idx}: missing SKU")
 
-            description = get("description")
-            unit = get("unit")
-            unit_price_raw = get("unit_price")
+            description = row[description_col].strip()
+            unit = row[unit_col].strip()
+            unit_price_raw = row[unit_price_col].strip()
 
             if not unit_price_raw:
                 raise ValueError(f"Row {idx} (SKU {sku}): missing unit_price/price")
@@ -108,14 +176,14 @@ def load_pricebook(path: str | Path) -> Pricebook:
                 ) from exc
 
             unit_cost_value: Optional[float] = None
-            unit_cost_raw = get("unit_cost")
+            unit_cost_raw = row[unit_cost_col].strip() if unit_cost_col >= 0 else ""
             if unit_cost_raw:
                 try:
                     unit_cost_value = float(unit_cost_raw)
                 except ValueError:
                     unit_cost_value = None
 
-            category = get("category") or None
+            category = (row[category_col].strip() if category_col >= 0 else "") or None
 
             items[sku] = PricebookItem(
                 sku=sku,
@@ -126,9 +194,72 @@ def load_pricebook(path: str | Path) -> Pricebook:
                 category=category,
             )
 
+    items.reindex()
     return items
 
 
+# Bump when the pickled Pricebook layout changes so older caches are rebuilt.
+_CACHE_VERSION = 2
+
+
+def _cache_path(path: Path) -> Path:
+    return path.with_name(path.name + ".pkl")
+
+
+def _cache_key(path: Path) -> Tuple[str, int, int]:
+    stat = path.stat()
+    return (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+
+
+def _write_cache(path: Path) -> Pricebook:
+    """
+    Parse the CSV and atomically (re)write its pickle cache.
+
+    The cache is best-effort: if it can't be written (read-only directory,
+    full disk, ...) the parsed pricebook is still returned.
+    """
+    key = _cache_key(path)
+    pricebook = load_pricebook(path)
+    cache_path = _cache_path(path)
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp_path.open("wb") as f:
+            pickle.dump(
+                (_CACHE_VERSION, key, pricebook), f, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(tmp_path, cache_path)
+    except OSError as exc:
+        logger.warning("Could not write pricebook cache %s: %s", cache_path, exc)
+        tmp_path.unlink(missing_ok=True)
+    return pricebook
+
+
+def load_pricebook_cached(path: str | Path) -> Pricebook:
+    """
+    Load a pricebook, using a pickle cache stored next to the CSV.
+
+    The cache is keyed by the CSV's path, mtime and size. If the cache is
+    fresh it is returned directly. If the CSV has changed, or there is no
+    usable cache, the CSV is parsed and the cache is rewritten before
+    returning, so a stale snapshot is never served.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Pricebook CSV not found: {path}")
+
+    try:
+        with _cache_path(path).open("rb") as f:
+            version, cached_key, cached = pickle.load(f)
+    except Exception:
+        # Missing, truncated or incompatible (e.g. written by other code);
+        # unpickling can fail with almost any exception type.
+        return _write_cache(path)
+    if version != _CACHE_VERSION or cached_key != _cache_key(path):
+        return _write_cache(path)
+
+    return cached
+
+
 def get_item(pricebook: Pricebook, sku: str) -> PricebookItem:
     """
     Look up an item in the pricebook, raising a clear error if missing.
@@ -0,0 +1,257 @@
+# app/pricebook_shared.py
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import sys
+import time
+from collections.abc import Mapping
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Dict, Iterator
+
+import numpy as np
+
+from app.pricebook_loader import (
+    REQUIRED_FENCE_CATEGORIES,
+    Pricebook,
+    PricebookItem,
+    load_pricebook,
+)
+
+
+_STRING_FIELDS = ("sku", "description", "unit", "category")
+_HEADER_LEN_BYTES = 8
+_ATTACH_TIMEOUT_S = 5.0
+
+
+class _AbandonedSegment(RuntimeError):
+    """
+    The segment exists but was never filled in, so its creator likely died.
+    """
+
+
+def _dtype(widths: Dict[str, int]) -> np.dtype:
+    return np.dtype(
+        [
+            ("sku", f"U{widths['sku']}"),
+            ("description", f"U{widths['description']}"),
+            ("unit", f"U{widths['unit']}"),
+            ("unit_price", "f8"),
+            ("unit_cost", "f8"),
+            ("category", f"U{widths['category']}"),
+        ]
+    )
+
+
+def _data_offset(header_len: int) -> int:
+    # Keep the record array 16-byte aligned after the JSON header.
+    return -(-(_HEADER_LEN_BYTES + header_len) // 16) * 16
+
+
+def _segment_name(path: Path) -> str:
+    """
+    Name the segment after the CSV's path, mtime and size, so every worker
+    agrees on it and an edited CSV gets a fresh segment.
+    """
+    stat = path.stat()
+    key = f"{path.resolve()}:{stat.st_mtime_ns}:{stat.st_size}"
+    return "fe_pb_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _open_segment(name: str, create: bool = False, size: int = 0) -> SharedMemory:
+    """
+    Open a segment without handing it to multiprocessing's resource tracker.
+
+    Before 3.13 the tracker unlinks every segment a process opened when that
+    process exits, even ones it only attached to, which would tear down the
+    pricebook under the remaining workers. Segments are instead unlinked
+    explicitly by SharedPricebook.close() in the creating worker.
+    """
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, create=create, size=size, track=False)
+    shm = SharedMemory(name=name, create=create, size=size)
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _unlink_segment(name: str) -> None:
+    """
+    Remove a segment's name, bypassing the resource tracker like _open_segment.
+
+    Works on segments too small to open. A no-op on Windows, where a segment
+    goes away with its last handle.
+    """
+    try:
+        import _posixshmem
+    except ImportError:  # pragma: no cover - Windows
+        return
+    try:
+        _posixshmem.shm_unlink("/" + name)
+    except FileNotFoundError:
+        pass
+
+
+def _create_segment(name: str, pricebook: Pricebook) -> SharedMemory:
+    items = list(pricebook.values())
+    widths = {
+        field: max([1] + [len(getattr(item, field) or "") for item in items])
+        for field in _STRING_FIELDS
+    }
+    rows = np.array(
+        [
+            (
+                item.sku,
+                item.description,
+                item.unit,
+                item.unit_price,
+                math.nan if item.unit_cost is None else item.unit_cost,
+                item.category or "",
+            )
+            for item in items
+        ],
+        dtype=_dtype(widths),
+    )
+    header = json.dumps({"rows": len(items), "widths": widths}).encode("utf-8")
+    offset = _data_offset(len(header))
+
+    shm = _open_segment(name, create=True, size=offset + rows.nbytes)
+    try:
+        shm.buf[offset : offset + rows.nbytes] = rows.tobytes()
+        shm.buf[_HEADER_LEN_BYTES : _HEADER_LEN_BYTES + len(header)] = header
+        # Written last: attachers wait for a non-zero length before reading.
+        shm.buf[:_HEADER_LEN_BYTES] = len(header).to_bytes(_HEADER_LEN_BYTES, "little")
+    except BaseException:
+        # Don't leave a half-written segment for other workers to wait on.
+        shm.close()
+        _unlink_segment(name)
+        raise
+    return shm
+
+
+def _attach_segment(name: str) -> SharedMemory:
+    """
+    Open an existing segment, waiting while its creator is still sizing it.
+
+    Between the creator's shm_open and ftruncate the segment is 0 bytes and
+    SharedMemory raises ValueError (cannot mmap an empty file).
+    """
+    deadline = time.monotonic() + _ATTACH_TIMEOUT_S
+    while True:
+        try:
+            return _open_segment(name)
+        except ValueError:
+            if time.monotonic() > deadline:
+                raise _AbandonedSegment(f"Shared pricebook {name} was never sized")
+            time.sleep(0.01)
+
+
+class SharedPricebook(Mapping):
+    """
+    Read-only pricebook backed by a shared memory segment.
+
+    Rows live in a NumPy structured array shared by every worker process;
+    each worker only keeps a SKU -> row index and builds PricebookItem
+    objects on lookup. Supports the same reads as Pricebook, including
+    ``by_category`` and ``missing_categories``.
+
+    The worker that created the segment owns it and unlinks it on close().
+    """
+
+    def __init__(self, shm: SharedMemory, owner: bool = False) -> None:
+        deadline = time.monotonic() + _ATTACH_TIMEOUT_S
+        header_len = int.from_bytes(shm.buf[:_HEADER_LEN_BYTES], "little")
+        while not header_len:
+            if time.monotonic() > deadline:
+                shm.close()
+                raise _AbandonedSegment(f"Shared pricebook {shm.name} was never populated")
+            time.sleep(0.01)
+            header_len = int.from_bytes(shm.buf[:_HEADER_LEN_BYTES], "little")
+
+        header = json.loads(
+            bytes(shm.buf[_HEADER_LEN_BYTES : _HEADER_LEN_BYTES + header_len])
+        )
+        self._shm = shm
+        self._owner = owner
+        self._rows = np.ndarray(
+            (header["rows"],),
+            dtype=_dtype(header["widths"]),
+            buffer=shm.buf,
+            offset=_data_offset(header_len),
+        )
+        self._index: Dict[str, int] = {
+            sku: i for i, sku in enumerate(self._rows["sku"].tolist())
+        }
+        self.by_category: Dict[str, PricebookItem] = {}
+        for i, category in enumerate(self._rows["category"].tolist()):
+            if category and category not in self.by_category:
+                self.by_category[category] = self._item(i)
+        self.missing_categories = REQUIRED_FENCE_CATEGORIES.difference(self.by_category)
+
+    def _item(self, i: int) -> PricebookItem:
+        sku, description, unit, unit_price, unit_cost, category = self._rows[i].item()
+        return PricebookItem(
+            sku=sku,
+            description=description,
+            unit=unit,
+            unit_price=unit_price,
+            unit_cost=None if math.isnan(unit_cost) else unit_cost,
+            category=category or None,
+        )
+
+    def __getitem__(self, sku: str) -> PricebookItem:
+        return self._item(self._index[sku])
+
+    def __contains__(self, sku: object) -> bool:
+        return sku in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def close(self) -> None:
+        """
+        Release this process's mapping, unlinking the segment if we own it.
+
+        Workers that already attached keep their mapping; workers started
+        afterwards publish a fresh segment.
+        """
+        self._rows = None
+        self._shm.close()
+        if self._owner:
+            _unlink_segment(self._shm.name)
+
+
+def load_shared_pricebook(path: str | Path) -> SharedPricebook:
+    """
+    Attach to the shared pricebook for this CSV, creating it if needed.
+
+    The first worker to start parses the CSV and publishes it; the others
+    attach to the existing segment without parsing anything. The creator
+    always parses the CSV itself (never a cached copy), so a segment named
+    after the CSV's mtime and size holds that CSV's contents. A segment whose
+    creator died before filling it in is unlinked and published again.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Pricebook CSV not found: {path}")
+
+    name = _segment_name(path)
+    try:
+        return SharedPricebook(_attach_segment(name))
+    except FileNotFoundError:
+        pass
+    except _AbandonedSegment:
+        _unlink_segment(name)
+
+    pricebook = load_pricebook(path)
+    try:
+        shm = _create_segment(name, pricebook)
+    except FileExistsError:
+        # Another worker created it first.
+        return SharedPricebook(_attach_segment(name))
+    return SharedPricebook(shm, owner=True)